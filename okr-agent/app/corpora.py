@@ -0,0 +1,149 @@
+import glob, hashlib, hmac, json, os, shutil, threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_community.vectorstores import FAISS
+
+def parse_corpora(spec: str, default_dir: str) -> Dict[str, str]:
+    """
+    Parse OKR_CORPORA ("sales=/data/sales,platform=/data/platform") into name -> directory.
+    An empty spec means a single corpus called "default" rooted at default_dir.
+    """
+    corpora: Dict[str, str] = {}
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, sep, path = part.partition("=")
+        if not sep or not name.strip() or not path.strip():
+            raise ValueError(f"Invalid OKR_CORPORA entry {part!r}; expected name=/path/to/okrs")
+        corpora[name.strip().lower()] = path.strip()
+    return corpora or {"default": default_dir}
+
+def fingerprint(okr_dir: str, extra: str = "") -> str:
+    """Hash of every Markdown file's path, size and mtime (plus extra, e.g. the model name)."""
+    h = hashlib.sha1(extra.encode("utf-8"))
+    for path in sorted(glob.glob(os.path.join(okr_dir, "**/*.md"), recursive=True)):
+        st = os.stat(path)
+        h.update(f"{os.path.relpath(path, okr_dir)}|{st.st_size}|{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+def estimate_bytes(stores: List[Any], text_bytes: int) -> int:
+    """Approximate resident size: float32 vectors of every FAISS store plus the stored text."""
+    vectors = sum(s.index.ntotal * s.index.d * 4 for s in stores if s is not None)
+    return vectors + text_bytes
+
+def _file_hashes(cache_dir: str) -> Dict[str, str]:
+    """sha256 of every file in the saved store subdirectories, keyed by relative path."""
+    hashes = {}
+    for path in sorted(glob.glob(os.path.join(cache_dir, "*", "*"))):
+        with open(path, "rb") as f:
+            hashes[os.path.relpath(path, cache_dir).replace("\\", "/")] = hashlib.sha256(f.read()).hexdigest()
+    return hashes
+
+def _sign(key: bytes, data: bytes) -> str:
+    return hmac.new(key, data, hashlib.sha256).hexdigest()
+
+def _load_local(path: str, embeddings):
+    try:
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    except TypeError:  # older langchain-community without the flag
+        return FAISS.load_local(path, embeddings)
+
+def save_stores(cache_dir: str, key: bytes, store, team_stores: Dict[str, Any], quarter_stores: Dict[str, Any]):
+    """
+    Write the global/team/quarter FAISS stores of one corpus build to cache_dir, with a
+    manifest of file hashes signed with key (HMAC-SHA256).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    sig_path = os.path.join(cache_dir, "manifest.sig")
+    if os.path.exists(sig_path):  # rewriting (refresh): invalidate until complete again
+        os.remove(sig_path)
+    manifest = {"team": {}, "quarter": {}, "files": {}}
+    store.save_local(os.path.join(cache_dir, "global"))
+    for kind, stores in (("team", team_stores), ("quarter", quarter_stores)):
+        for i, (name, s) in enumerate(sorted(stores.items())):
+            sub = f"{kind}-{i}"
+            s.save_local(os.path.join(cache_dir, sub))
+            manifest[kind][sub] = name
+    manifest["files"] = _file_hashes(cache_dir)
+    data = json.dumps(manifest, sort_keys=True).encode("utf-8")
+    with open(os.path.join(cache_dir, "manifest.json"), "wb") as f:
+        f.write(data)
+    # Signature last: its presence marks the on-disk form as complete
+    with open(sig_path, "w", encoding="utf-8") as f:
+        f.write(_sign(key, data))
+
+def prune_stale(corpus_dir: str, keep: str):
+    """Remove on-disk builds of a corpus other than the current fingerprint."""
+    if not os.path.isdir(corpus_dir):
+        return
+    for entry in os.listdir(corpus_dir):
+        if entry != keep:
+            shutil.rmtree(os.path.join(corpus_dir, entry), ignore_errors=True)
+
+def load_stores(cache_dir: str, key: bytes, embeddings) -> Optional[Dict[str, Any]]:
+    """
+    Load stores written by save_stores, or None if no complete on-disk form exists.
+    FAISS stores are pickled, so nothing is unpickled unless the manifest signature
+    matches key and every file matches its recorded hash; otherwise the caller rebuilds.
+    """
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    sig_path = os.path.join(cache_dir, "manifest.sig")
+    if not (os.path.exists(manifest_path) and os.path.exists(sig_path)):
+        return None
+    with open(manifest_path, "rb") as f:
+        data = f.read()
+    with open(sig_path, "r", encoding="utf-8") as f:
+        sig = f.read().strip()
+    if not hmac.compare_digest(sig, _sign(key, data)):
+        return None
+    manifest = json.loads(data)
+    if _file_hashes(cache_dir) != manifest.get("files"):
+        return None
+    out = {"store": _load_local(os.path.join(cache_dir, "global"), embeddings), "team_stores": {}, "quarter_stores": {}}
+    for kind in ("team", "quarter"):
+        for sub, key in manifest[kind].items():
+            out[f"{kind}_stores"][key] = _load_local(os.path.join(cache_dir, sub), embeddings)
+    return out
+
+class CorpusCache:
+    """
+    LRU of built corpus states under an approximate memory budget (state["size_bytes"]).
+    Inserting a corpus evicts the least recently used ones until the total fits; the
+    most recent corpus is always kept even if it alone exceeds the budget.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            st = self._items.get(name)
+            if st is not None:
+                self._items.move_to_end(name)
+            return st
+
+    def put(self, name: str, st: Dict[str, Any]) -> List[str]:
+        """Insert or replace a corpus; returns the names evicted to stay under budget."""
+        evicted = []
+        with self._lock:
+            self._items[name] = st
+            self._items.move_to_end(name)
+            while len(self._items) > 1 and self._total() > self.budget_bytes:
+                old, _ = self._items.popitem(last=False)
+                evicted.append(old)
+        return evicted
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return list(self._items)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total()
+
+    def _total(self) -> int:
+        return sum(st.get("size_bytes", 0) for st in self._items.values())
@@ -0,0 +1,86 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.parser import extract_objective, extract_section_items, kr_number, label_key_results
+
+SECTIONS = ("objectives", "key_results", "risks")
+
+_SECTION_WORDS = {
+    "objective": "objectives", "objectives": "objectives",
+    "kr": "key_results", "krs": "key_results",
+    "risk": "risks", "risks": "risks",
+}
+_LEAD_IN = ("what", "are", "the")
+
+def query_sections(q: str) -> Optional[List[str]]:
+    """
+    Sections asked for by a query made only of section words, e.g.
+    "what are the objectives and key results?" -> ["objectives", "key_results"].
+    Returns None when the query has any other term and needs a real search.
+    Tokenizes once and scans linearly, so cost is bounded by the query length.
+    """
+    tokens = [t for t in re.split(r"[\s,&?]+", (q or "").lower()) if t and t != "and"]
+    i = 0
+    for word in _LEAD_IN:  # optional "what are the" lead-in
+        if i < len(tokens) and tokens[i] == word:
+            i += 1
+    found = set()
+    while i < len(tokens):
+        if tokens[i] in _SECTION_WORDS:
+            found.add(_SECTION_WORDS[tokens[i]])
+            i += 1
+        elif tokens[i] == "key" and i + 1 < len(tokens) and tokens[i + 1] in ("result", "results"):
+            found.add("key_results")
+            i += 2
+        else:
+            return None
+    return [s for s in SECTIONS if s in found] or None
+
+def _entry(d: Dict[str, Any], normalize_meta) -> Dict[str, Any]:
+    """One document's objective, KRs in KR order, and risks, formatted like /ask bullets."""
+    meta = d["meta"]
+    body = d.get("plain_text", "")
+    objective = extract_objective(body)
+    krs = label_key_results(extract_section_items(body, "Key Results"))
+    return {
+        "path": d["path"],
+        "team": normalize_meta(meta.get("team")),
+        "quarter": normalize_meta(meta.get("quarter")),
+        "owner": normalize_meta(meta.get("owner")),
+        "status": normalize_meta(meta.get("status")),
+        "objective": f"Objective: {objective}" if objective else None,
+        "key_results": sorted(krs, key=kr_number),
+        "risks": [r for r in extract_section_items(body, "Risks") if len(r) > 10],
+    }
+
+def build_digests(docs: List[Dict[str, Any]], normalize_meta) -> Dict[Tuple[Optional[str], Optional[str]], List[Dict[str, Any]]]:
+    """
+    Precompute digests keyed by (team, quarter), with None as a wildcard:
+    (team, None), (None, quarter), (team, quarter) and (None, None) for everything.
+    Entries are ordered by path so the same digest always renders the same way.
+    """
+    digests: Dict[Tuple[Optional[str], Optional[str]], List[Dict[str, Any]]] = {(None, None): []}
+    for d in sorted(docs, key=lambda d: d["path"]):
+        e = _entry(d, normalize_meta)
+        team, quarter = e["team"] or None, e["quarter"] or None
+        keys = {(None, None), (team, None), (None, quarter), (team, quarter)}
+        for key in keys:
+            digests.setdefault(key, []).append(e)
+    return digests
+
+def digest_bullets(entries: List[Dict[str, Any]], include: List[str]) -> List[str]:
+    """Flatten digest entries into /ask-style bullets, each objective followed by its KRs and risks."""
+    bullets, seen = [], set()
+    for e in entries:
+        items = []
+        if "objectives" in include and e["objective"]:
+            items.append(e["objective"])
+        if "key_results" in include:
+            items.extend(e["key_results"])
+        if "risks" in include:
+            items.extend(e["risks"])
+        for b in items:
+            if b not in seen:
+                bullets.append(b)
+                seen.add(b)
+    return bullets
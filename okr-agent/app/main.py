@@ -1,18 +1,42 @@
-import os, io, csv, tempfile, zipfile, re, html
+import os, io, csv, json, tempfile, zipfile, re, html, hashlib, secrets, threading
 from typing import List, Dict, Any, Optional
-from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from app.parser import load_markdown_docs
+from app.parser import kr_number, label_key_results, load_markdown_docs
+from app.matcher import KeywordMatcher, build_lookup, normalize, quarter_aliases
+from app.rollup import GROUPABLE, build_tables
+from app.targets import TargetIndex, normalize_unit
+from app.digest import SECTIONS, build_digests, digest_bullets, query_sections
+from app.corpora import CorpusCache, estimate_bytes, fingerprint, load_stores, parse_corpora, prune_stale, save_stores
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 
+try:  # brotli is optional; gzip is always available
+    from brotli_asgi import BrotliMiddleware as _CompressionMiddleware
+except ImportError:
+    _CompressionMiddleware = GZipMiddleware
+
 OKR_DIR = os.getenv("OKR_DIR", "/data/okrs")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Named corpora served by this process: "sales=/data/sales,platform=/data/platform".
+# Unset means a single "default" corpus at OKR_DIR.
+CORPORA = parse_corpora(os.getenv("OKR_CORPORA", ""), OKR_DIR)
+DEFAULT_CORPUS = os.getenv("OKR_DEFAULT_CORPUS", next(iter(CORPORA))).strip().lower()
+if DEFAULT_CORPUS not in CORPORA:
+    raise ValueError(f"OKR_DEFAULT_CORPUS {DEFAULT_CORPUS!r} is not one of OKR_CORPORA: {', '.join(sorted(CORPORA))}")
+INDEX_CACHE_DIR = os.getenv("INDEX_CACHE_DIR", "")  # on-disk FAISS stores for evicted/restarted corpora; empty disables
+# Signs the on-disk manifest so only stores written with this key are unpickled. Without it a
+# random per-process key is used: evicted corpora still reload from disk, restarts re-embed.
+INDEX_CACHE_KEY = os.getenv("INDEX_CACHE_KEY", "").encode("utf-8") or secrets.token_bytes(32)
+INDEX_MEMORY_BUDGET_MB = int(os.getenv("INDEX_MEMORY_BUDGET_MB", "1024"))
+UI_CACHE_MAX_AGE = int(os.getenv("UI_CACHE_MAX_AGE", "31536000"))  # seconds, for non-HTML UI assets
 
 app = FastAPI(title="OKR Markdown Agent (No-API-Key)")
 
@@ -22,10 +46,59 @@ app.add_middleware(
     allow_methods=["*"], allow_headers=["*"],
 )
 
+class _Compression(_CompressionMiddleware):
+    """Compress responses over 1KB, except streams that must flush event by event."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/ask/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(_Compression, minimum_size=1000)
+
 class Hit(BaseModel):
     path: str
     snippet: str
 
+class RollupResponse(BaseModel):
+    table: str
+    group_by: List[str]
+    total: int
+    groups: List[Dict[str, Any]]
+
+class KRTarget(BaseModel):
+    path: str
+    team: str
+    quarter: str
+    kr: str
+    text: str
+    baseline: Optional[float] = None
+    target: Optional[float] = None   # None for "by N" KRs, which only carry a delta
+    unit: str
+    comparator: Optional[str] = None
+    delta: Optional[float] = None
+
+class DigestEntry(BaseModel):
+    path: str
+    team: str
+    quarter: str
+    owner: str
+    status: str
+    objective: Optional[str] = None
+    key_results: List[str]
+    risks: List[str]
+
+class DigestResponse(BaseModel):
+    query: Optional[str] = None
+    team: Optional[str] = None
+    quarter: Optional[str] = None
+    include: List[str]
+    bullets: List[str]
+    objectives: List[DigestEntry]
+    teams: List[str]
+    quarters: List[str]
+
 class AskResponse(BaseModel):
     query: str
     bullets: List[str]
@@ -34,22 +107,54 @@ class AskResponse(BaseModel):
     quarter: Optional[str] = None
 
 state: Dict[str, Any] = {
-    "docs": [],
-    "store": None,                 # global index
-    "team_stores": {},             # NEW: team -> FAISS
-    "quarter_stores": {},          # NEW: quarter -> FAISS
-    "teams": set(),                # NEW: discovered teams
-    "quarters": set(),             # NEW: discovered quarters
     "splitter": RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150),
-    "embeddings": None,
+    "embeddings": None,            # one embedding model shared by every corpus
+    "corpora": CorpusCache(INDEX_MEMORY_BUDGET_MB * 1024 * 1024),  # name -> built corpus state (LRU)
 }
+_embeddings_lock = threading.Lock()
+_build_locks: Dict[str, threading.Lock] = {name: threading.Lock() for name in CORPORA}
+
+def _new_corpus_state(name: str) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "okr_dir": CORPORA[name],
+        "docs": [],
+        "store": None,                 # global index
+        "team_stores": {},             # team -> FAISS
+        "quarter_stores": {},          # quarter -> FAISS
+        "teams": set(),                # discovered teams
+        "quarters": set(),             # discovered quarters
+        "team_lookup": {},             # case-folded team -> canonical team
+        "quarter_lookup": {},          # case-folded quarter (and aliases) -> canonical quarter
+        "team_matcher": None,          # Aho-Corasick over team_lookup keys
+        "quarter_matcher": None,       # Aho-Corasick over quarter_lookup keys
+        "tables": {},                  # columnar objectives / key_results tables for /rollup
+        "owner_lookup": {},
+        "status_lookup": {},
+        "targets": None,               # TargetIndex of numeric KR baselines/targets
+        "digests": {},                 # (team|None, quarter|None) -> precomputed OKR digest entries
+        "fingerprint": "",             # hash of the corpus files; part of every ETag
+        "size_bytes": 0,               # approximate resident size, for the cache budget
+    }
 
 def _normalize_meta(meta_val: Any) -> str:
     return str(meta_val or "").strip()
 
-def _build():
-    docs = load_markdown_docs(OKR_DIR)
-    state["docs"] = docs
+def _get_embeddings():
+    with _embeddings_lock:
+        if state["embeddings"] is None:
+            state["embeddings"] = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
+        return state["embeddings"]
+
+def _build(name: str, use_disk: bool = True) -> Dict[str, Any]:
+    """
+    Build one corpus. Frontmatter-derived structures are always rebuilt from Markdown;
+    FAISS stores are loaded from INDEX_CACHE_DIR when the corpus files are unchanged,
+    otherwise embedded and written back there.
+    """
+    st = _new_corpus_state(name)
+    docs = load_markdown_docs(st["okr_dir"])
+    st["docs"] = docs
 
     teams = set()
     quarters = set()
@@ -58,8 +163,24 @@ def _build():
         quarters.add(_normalize_meta(d["meta"].get("quarter")))
     teams.discard("")      # clean empties
     quarters.discard("")
-    state["teams"] = teams
-    state["quarters"] = quarters
+    st["teams"] = teams
+    st["quarters"] = quarters
+
+    # Precompile filter resolution so per-request cost doesn't grow with teams/quarters
+    st["team_lookup"] = build_lookup(teams)
+    st["quarter_lookup"] = build_lookup(quarters, aliases=quarter_aliases)
+    st["team_matcher"] = KeywordMatcher(st["team_lookup"])
+    st["quarter_matcher"] = KeywordMatcher(st["quarter_lookup"])
+
+    # Columnar frontmatter tables for aggregations (no embeddings involved)
+    tables = build_tables(docs, _normalize_meta)
+    st["tables"] = tables
+    st["owner_lookup"] = build_lookup(set(tables["objectives"].columns["owner"]))
+    st["status_lookup"] = build_lookup(set(tables["objectives"].columns["status"]))
+    st["targets"] = TargetIndex(tables["key_results"])
+
+    # Warm the hottest Slack queries: per-team / per-quarter objectives, KRs and risks
+    st["digests"] = build_digests(docs, _normalize_meta)
 
     splitter = state["splitter"]
     chunks, metadatas = [], []
@@ -75,68 +196,79 @@ def _build():
                 "plain_text": d.get("plain_text", "")  # Store plain text for sentence extraction
             })
 
-    if state["embeddings"] is None:
-        state["embeddings"] = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
-
-    # Global index
-    state["store"] = FAISS.from_texts(chunks, state["embeddings"], metadatas=metadatas)
-
-    # Build per-team stores (subset the same chunks)
-    state["team_stores"] = {}
-    for team in teams:
-        team_texts = [c for c, m in zip(chunks, metadatas) if m.get("team") == team]
-        team_mds   = [m for m in metadatas if m.get("team") == team]
-        if team_texts:
-            state["team_stores"][team] = FAISS.from_texts(team_texts, state["embeddings"], metadatas=team_mds)
-
-    # Build per-quarter stores
-    state["quarter_stores"] = {}
-    for quarter in quarters:
-        q_texts = [c for c, m in zip(chunks, metadatas) if m.get("quarter") == quarter]
-        q_mds   = [m for m in metadatas if m.get("quarter") == quarter]
-        if q_texts:
-            state["quarter_stores"][quarter] = FAISS.from_texts(q_texts, state["embeddings"], metadatas=q_mds)
-
-def _ensure_built():
-    if state["store"] is None:
-        _build()
-
-def _normalize_team_param(team: Optional[str]) -> Optional[str]:
+    embeddings = _get_embeddings()
+    # Same files give the same fingerprint, so ETags survive eviction and reload
+    fp = fingerprint(st["okr_dir"], EMBED_MODEL)
+    st["fingerprint"] = fp
+    cache_dir = os.path.join(INDEX_CACHE_DIR, name, fp) if INDEX_CACHE_DIR else None
+
+    loaded = load_stores(cache_dir, INDEX_CACHE_KEY, embeddings) if (cache_dir and use_disk) else None
+    if loaded:
+        st.update(loaded)
+    else:
+        # Global index
+        st["store"] = FAISS.from_texts(chunks, embeddings, metadatas=metadatas)
+
+        # Build per-team stores (subset the same chunks)
+        st["team_stores"] = {}
+        for team in teams:
+            team_texts = [c for c, m in zip(chunks, metadatas) if m.get("team") == team]
+            team_mds   = [m for m in metadatas if m.get("team") == team]
+            if team_texts:
+                st["team_stores"][team] = FAISS.from_texts(team_texts, embeddings, metadatas=team_mds)
+
+        # Build per-quarter stores
+        st["quarter_stores"] = {}
+        for quarter in quarters:
+            q_texts = [c for c, m in zip(chunks, metadatas) if m.get("quarter") == quarter]
+            q_mds   = [m for m in metadatas if m.get("quarter") == quarter]
+            if q_texts:
+                st["quarter_stores"][quarter] = FAISS.from_texts(q_texts, embeddings, metadatas=q_mds)
+
+        if cache_dir:
+            save_stores(cache_dir, INDEX_CACHE_KEY, st["store"], st["team_stores"], st["quarter_stores"])
+            prune_stale(os.path.join(INDEX_CACHE_DIR, name), keep=fp)
+
+    # Each chunk (and its plain_text metadata) is held by the global, a team and a quarter store
+    text_bytes = 3 * sum(len(c) + len(m["plain_text"]) for c, m in zip(chunks, metadatas))
+    stores = [st["store"], *st["team_stores"].values(), *st["quarter_stores"].values()]
+    st["size_bytes"] = estimate_bytes(stores, text_bytes)
+    return st
+
+def _resolve_corpus_name(corpus: Optional[str]) -> str:
+    name = (corpus or DEFAULT_CORPUS).strip().lower()
+    if name not in CORPORA:
+        raise HTTPException(status_code=404, detail=f"Unknown corpus '{corpus}'. Available: {', '.join(sorted(CORPORA))}.")
+    return name
+
+def _ensure_built(corpus: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+    """Return the built state for a corpus, building it on first use (or when forced)."""
+    name = _resolve_corpus_name(corpus)
+    st = None if force else state["corpora"].get(name)
+    if st is not None:
+        return st
+    with _build_locks[name]:
+        st = None if force else state["corpora"].get(name)
+        if st is None:
+            st = _build(name, use_disk=not force)
+            state["corpora"].put(name, st)
+    return st
+
+def _normalize_team_param(st: Dict[str, Any], team: Optional[str]) -> Optional[str]:
     """Normalize team parameter to match stored team names (case-insensitive)."""
-    if not team:
-        return None
-    team_lower = team.lower()
-    for t in state["teams"]:
-        if t and t.lower() == team_lower:
-            return t
-    return team  # return original if no match found
-
-def _normalize_quarter_param(quarter: Optional[str]) -> Optional[str]:
-    """Normalize quarter parameter to match stored quarter names (case-insensitive)."""
-    if not quarter:
-        return None
-    quarter_lower = quarter.lower()
-    for q in state["quarters"]:
-        if q and q.lower() == quarter_lower:
-            return q
-    return quarter  # return original if no match found
-
-def _infer_filters_from_query(q: str) -> Dict[str, Optional[str]]:
-    """Look for any known team/quarter names inside the query text (case-insensitive)."""
-    q_low = q.lower()
-    team_hit = None
-    for t in state["teams"]:
-        if t and t.lower() in q_low:
-            team_hit = t
-            break
-    quarter_hit = None
-    for qu in state["quarters"]:
-        if qu and qu.lower() in q_low:
-            quarter_hit = qu
-            break
+    return normalize(team, st["team_lookup"])
+
+def _normalize_quarter_param(st: Dict[str, Any], quarter: Optional[str]) -> Optional[str]:
+    """Normalize quarter parameter to match stored quarter names (case-insensitive, accepts aliases like "Q3 2025")."""
+    return normalize(quarter, st["quarter_lookup"])
+
+def _infer_filters_from_query(st: Dict[str, Any], q: str) -> Dict[str, Optional[str]]:
+    """Find the longest known team/quarter name (or quarter alias) inside the query text."""
+    team_hit = st["team_matcher"].find(q) if st["team_matcher"] else None
+    quarter_hit = st["quarter_matcher"].find(q) if st["quarter_matcher"] else None
     return {"team": team_hit, "quarter": quarter_hit}
 
-def _pick_store(team: Optional[str], quarter: Optional[str]):
+def _pick_store(st: Dict[str, Any], team: Optional[str], quarter: Optional[str]):
     """
     Choose the most selective store:
     - if team & quarter: use team store, filter results by quarter afterward
@@ -144,26 +276,200 @@ def _pick_store(team: Optional[str], quarter: Optional[str]):
     - if only quarter: quarter store
     - else: global store
     """
-    if team and team in state["team_stores"]:
-        return state["team_stores"][team], "team"
-    if quarter and quarter in state["quarter_stores"]:
-        return state["quarter_stores"][quarter], "quarter"
-    return state["store"], "global"
+    if team and team in st["team_stores"]:
+        return st["team_stores"][team], "team"
+    if quarter and quarter in st["quarter_stores"]:
+        return st["quarter_stores"][quarter], "quarter"
+    return st["store"], "global"
+
+_CACHEABLE_PATHS = {"/health", "/search", "/ask", "/ask/stream", "/rollup", "/targets", "/digest", "/download"}
+
+def _request_etag(st: Dict[str, Any], path: str, params) -> str:
+    """Weak ETag from the corpus fingerprint, the path and the normalized query parameters."""
+    norm = []
+    for key, value in sorted(params.multi_items()):
+        if key == "team":
+            value = _normalize_team_param(st, value) or ""
+        elif key == "quarter":
+            value = _normalize_quarter_param(st, value) or ""
+        elif key == "q":
+            value = " ".join(value.split())
+        elif key == "corpus":
+            continue
+        norm.append(f"{key}={value}")
+    raw = f"{st['name']}|{st['fingerprint']}|{path}|{'&'.join(norm)}"
+    return 'W/"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:24] + '"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == bare:
+            return True
+    return False
+
+@app.middleware("http")
+async def http_caching(request: Request, call_next):
+    """
+    Conditional GETs for API responses: the ETag is known before the route runs,
+    so a matching If-None-Match returns 304 without any embedding or search.
+    UI assets get long-lived Cache-Control (HTML is revalidated via StaticFiles' own ETag).
+    """
+    path = request.url.path
+    corpus = request.query_params.get("corpus")
+    if request.method == "GET" and path in _CACHEABLE_PATHS and (corpus or DEFAULT_CORPUS).strip().lower() in CORPORA:
+        st = await run_in_threadpool(_ensure_built, corpus)
+        etag = _request_etag(st, path, request.query_params)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        response = await call_next(request)
+        if response.status_code == 200:
+            response.headers.update(headers)
+        return response
+
+    response = await call_next(request)
+    if path.startswith("/ui") and response.status_code in (200, 304):
+        is_html = response.headers.get("content-type", "").startswith("text/html") or path.endswith((".html", "/")) or path == "/ui"
+        if is_html:
+            response.headers["Cache-Control"] = "no-cache"
+        else:
+            response.headers["Cache-Control"] = f"public, max-age={UI_CACHE_MAX_AGE}, immutable"
+    return response
 
 @app.get("/health")
-def health():
-    _ensure_built()
+def health(corpus: Optional[str] = Query(None)):
+    st = _ensure_built(corpus)
     return {
         "status": "ok",
-        "docs": len(state["docs"]),
-        "teams": sorted(list(state["teams"])),
-        "quarters": sorted(list(state["quarters"])),
+        "corpus": st["name"],
+        "corpora": sorted(CORPORA),
+        "docs": len(st["docs"]),
+        "teams": sorted(list(st["teams"])),
+        "quarters": sorted(list(st["quarters"])),
     }
 
 @app.post("/refresh")
-def refresh():
-    _build()
-    return {"status": "refreshed", "docs": len(state["docs"])}
+def refresh(corpus: Optional[str] = Query(None)):
+    """Rebuild one corpus, or every currently loaded corpus when none is given."""
+    names = [corpus] if corpus else (state["corpora"].loaded() or [DEFAULT_CORPUS])
+    docs = {}
+    for name in names:
+        st = _ensure_built(name, force=True)
+        docs[st["name"]] = len(st["docs"])
+    return {"status": "refreshed", "docs": sum(docs.values()), "corpora": docs}
+
+@app.get("/rollup", response_model=RollupResponse)
+def rollup(
+    table: str = Query("objectives"),
+    group_by: str = Query("status", description="Comma-separated: team, quarter, owner, status, path"),
+    team: Optional[str] = Query(None),
+    quarter: Optional[str] = Query(None),
+    owner: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    corpus: Optional[str] = Query(None),
+):
+    """
+    Count objectives or key results grouped by frontmatter fields, e.g.
+    /rollup?group_by=team,quarter,status or /rollup?table=key_results&group_by=owner.
+    Served from the columnar tables built in _build; no vector search.
+    """
+    st = _ensure_built(corpus)
+
+    if table not in st["tables"]:
+        raise HTTPException(status_code=400, detail="Unsupported table. Use 'objectives' or 'key_results'.")
+    columns = [c.strip().lower() for c in group_by.split(",") if c.strip()]
+    bad = [c for c in columns if c not in GROUPABLE]
+    if bad:
+        raise HTTPException(status_code=400, detail=f"Cannot group by {', '.join(bad)}. Use: {', '.join(sorted(GROUPABLE))}.")
+
+    tbl = st["tables"][table]
+    rows = tbl.select({
+        "team": _normalize_team_param(st, team),
+        "quarter": _normalize_quarter_param(st, quarter),
+        "owner": normalize(owner, st["owner_lookup"]),
+        "status": normalize(status, st["status_lookup"]),
+    })
+    groups = tbl.group_count(columns, rows) if columns else []
+    return RollupResponse(table=table, group_by=columns, total=len(rows), groups=groups)
+
+@app.get("/targets", response_model=List[KRTarget])
+def targets(
+    unit: Optional[str] = Query(None, description="ms, s, minutes, hours, days, weeks, %, $ or empty for plain counts"),
+    min_target: Optional[float] = Query(None),
+    max_target: Optional[float] = Query(None),
+    min_delta: Optional[float] = Query(None, description="target - baseline, or the signed 'by N' change"),
+    max_delta: Optional[float] = Query(None, description="target - baseline, or the signed 'by N' change"),
+    team: Optional[str] = Query(None),
+    quarter: Optional[str] = Query(None),
+    corpus: Optional[str] = Query(None),
+):
+    """
+    Numeric KR filters, e.g. /targets?unit=ms&max_target=300 for latency targets under 300ms,
+    or /targets?max_delta=0&team=Platform for KRs that reduce a baseline. No vector search.
+    """
+    st = _ensure_built(corpus)
+
+    rows = st["targets"].query(
+        unit=normalize_unit(unit),
+        min_target=min_target,
+        max_target=max_target,
+        min_delta=min_delta,
+        max_delta=max_delta,
+        team=_normalize_team_param(st, team),
+        quarter=_normalize_quarter_param(st, quarter),
+    )
+    return [KRTarget(**r) for r in rows]
+
+@app.get("/digest", response_model=DigestResponse)
+def digest(
+    team: Optional[str] = Query(None),
+    quarter: Optional[str] = Query(None),
+    include: str = Query("objectives,key_results", description="Comma-separated: objectives, key_results, risks"),
+    q: Optional[str] = Query(None, description="Section-only query (e.g. 'objectives and key results'); overrides include"),
+    corpus: Optional[str] = Query(None),
+):
+    """
+    Precomputed OKR digest for a team and/or quarter (or everything), e.g.
+    /digest?team=Platform or /digest?include=risks for the weekly risk sweep.
+    With q, the sections come from the query; queries with any other terms get a 422
+    so callers can fall back to /ask.
+    Built during _build/refresh; never touches the vector index.
+    """
+    st = _ensure_built(corpus)
+
+    if q is not None:
+        sections = query_sections(q)
+        if sections is None:
+            raise HTTPException(status_code=422, detail="Query needs a search; use /ask.")
+    else:
+        sections = [c.strip().lower() for c in include.split(",") if c.strip()]
+    bad = [c for c in sections if c not in SECTIONS]
+    if bad:
+        raise HTTPException(status_code=400, detail=f"Cannot include {', '.join(bad)}. Use: {', '.join(SECTIONS)}.")
+
+    team = _normalize_team_param(st, team)
+    quarter = _normalize_quarter_param(st, quarter)
+    if team and team not in st["teams"]:
+        raise HTTPException(status_code=404, detail=f"Unknown team '{team}'.")
+    if quarter and quarter not in st["quarters"]:
+        raise HTTPException(status_code=404, detail=f"Unknown quarter '{quarter}'.")
+
+    entries = st["digests"].get((team, quarter), [])
+    return DigestResponse(
+        query=q,
+        team=team,
+        quarter=quarter,
+        include=sections,
+        bullets=digest_bullets(entries, sections),
+        objectives=[DigestEntry(**e) for e in entries],
+        teams=sorted(st["teams"]),
+        quarters=sorted(st["quarters"]),
+    )
 
 @app.get("/search", response_model=List[Hit])
 def search(
@@ -171,19 +477,20 @@ def search(
     k: int = 50,  # Increased for comprehensive results in small system
     team: Optional[str] = Query(None),        # NEW
     quarter: Optional[str] = Query(None),     # NEW
+    corpus: Optional[str] = Query(None),
 ):
-    _ensure_built()
+    st = _ensure_built(corpus)
     
     # Normalize team and quarter parameters to match stored names
-    team = _normalize_team_param(team)
-    quarter = _normalize_quarter_param(quarter)
+    team = _normalize_team_param(st, team)
+    quarter = _normalize_quarter_param(st, quarter)
     
     # auto-infer if not provided
     if not team and not quarter:
-        guess = _infer_filters_from_query(q)
+        guess = _infer_filters_from_query(st, q)
         team, quarter = team or guess["team"], quarter or guess["quarter"]
 
-    store, mode = _pick_store(team, quarter)
+    store, mode = _pick_store(st, team, quarter)
     results = store.similarity_search(q, k=max(k*2, k))  # overfetch a bit
 
     # If both filters provided/guessed, post-filter to enforce both
@@ -207,28 +514,138 @@ def search(
         out.append(Hit(path=r.metadata.get("path", ""), snippet=snippet))
     return out
 
-@app.get("/ask", response_model=AskResponse)
-def ask(
-    q: str = Query(..., min_length=2),
-    k: int = 50,  # Increased for comprehensive results in small system
-    team: Optional[str] = Query(None),        # NEW
-    quarter: Optional[str] = Query(None),     # NEW
-):
+def _extract_doc_okr(text_content: str):
     """
-    Extractive answer with team/quarter filtering.
+    Pull the objective, key results and risks out of one rendered chunk, plus any
+    other meaningful sentences for the semantic fallback.
     """
-    _ensure_built()
+    # Initialize document-level OKR structure
+    doc_okr = {"objective": None, "key_results": [], "risks": []}
+    
+    # Extract objectives from H1 tags (either "Objective:" or just "Objective")
+    objective_matches = re.findall(r'<h1[^>]*>([^<]*(?:objective[^<]*|Objective[^<]*))</h1>', text_content, re.IGNORECASE)
+    for obj in objective_matches:
+        clean_obj = html.unescape(obj).strip()
+        # Handle both "Objective: Title" and just "Objective" formats
+        if clean_obj.lower() == 'objective':
+            # Look for the objective content in the next text
+            obj_content_match = re.search(r'<h1[^>]*>Objective</h1>\s*<p[^>]*>([^<]+)</p>', text_content, re.IGNORECASE)
+            if obj_content_match:
+                clean_obj = f"Objective: {html.unescape(obj_content_match.group(1)).strip()}"
+            else:
+                clean_obj = "Objective: [Content not found]"
+        elif not clean_obj.lower().startswith('objective:'):
+            clean_obj = f"Objective: {clean_obj}"
+        doc_okr["objective"] = clean_obj
+        break  # Only take first objective per document
+    
+    # Extract key results from different patterns
+    # First, try to extract from "Key Results" section
+    kr_section = re.search(r'<h2[^>]*>Key Results</h2>\s*<ul[^>]*>(.*?)</ul>', text_content, re.IGNORECASE | re.DOTALL)
+    if kr_section:
+        kr_items = re.findall(r'<li[^>]*>([^<]+)</li>', kr_section.group(1))
+        doc_okr["key_results"].extend(label_key_results(html.unescape(kr).strip() for kr in kr_items))
+    else:
+        # Fallback: Look for traditional KR1:, KR2: format in any list items
+        kr_matches = re.findall(r'<li[^>]*>(KR\d+:[^<]*)</li>', text_content, re.IGNORECASE)
+        for kr in kr_matches:
+            clean_kr = html.unescape(kr).strip()
+            doc_okr["key_results"].append(clean_kr)
     
+    # Extract risks from list items under risks section
+    risks_section = re.search(r'<h2[^>]*>Risks?</h2>\s*<ul[^>]*>(.*?)</ul>', text_content, re.IGNORECASE | re.DOTALL)
+    if risks_section:
+        risk_items = re.findall(r'<li[^>]*>([^<]+)</li>', risks_section.group(1))
+        for risk in risk_items:
+            clean_risk = html.unescape(risk).strip()
+            if len(clean_risk) > 10:
+                doc_okr["risks"].append(clean_risk)
+    
+    # Extract other meaningful content by removing HTML and getting sentences
+    clean_text = re.sub(r'<[^>]+>', ' ', text_content)
+    clean_text = html.unescape(clean_text)
+    clean_text = re.sub(r'\s+', ' ', clean_text).strip()
+    
+    sentences = []
+    for sentence in re.split(r'(?<=[.!?])\s+', clean_text):
+        sentence = sentence.strip()
+        if (20 <= len(sentence) <= 300 and 
+            not re.search(r'(objective|KR\d*|key results|risks):', sentence, re.IGNORECASE)):
+            sentences.append(sentence)
+    return doc_okr, sentences
+
+def _doc_bullets(doc_okr: Dict[str, Any], include: Dict[str, bool], seen_bullets: set) -> List[str]:
+    """Bullets for one document, keeping its KRs directly after its objective."""
+    bullets = []
+    # Add the objective for this document (if requested and exists)
+    if include["objectives"] and doc_okr["objective"]:
+        obj = doc_okr["objective"]
+        if obj not in seen_bullets:
+            bullets.append(obj)
+            seen_bullets.add(obj)
+    
+    # Add the key results for this document immediately after its objective (if requested)
+    if include["krs"] and doc_okr["key_results"]:
+        # Sort this document's KRs by their number (KR1, KR2, etc.)
+        for kr in sorted(doc_okr["key_results"], key=kr_number):
+            if kr not in seen_bullets:
+                bullets.append(kr)
+                seen_bullets.add(kr)
+    
+    # Add the risks for this document (if requested)
+    if include["risks"] and doc_okr["risks"]:
+        for risk in doc_okr["risks"]:
+            if risk not in seen_bullets:
+                bullets.append(risk)
+                seen_bullets.add(risk)
+    return bullets
+
+def _fallback_bullets(q: str, other_sentences: List[str]) -> List[str]:
+    """Score free-text sentences against the query when no OKR structure was found."""
+    emb = _get_embeddings()
+    q_vec = emb.embed_query(q)
+    s_vecs = emb.embed_documents(other_sentences)
+
+    def cos(a, b):
+        import math
+        dot = sum(x*y for x, y in zip(a, b))
+        na = math.sqrt(sum(x*x for x in a))
+        nb = math.sqrt(sum(y*y for y in b))
+        return dot / (na * nb + 1e-12)
+
+    scored = [(cos(q_vec, v), i) for i, v in enumerate(s_vecs)]
+    scored.sort(reverse=True)
+
+    top, seen = [], set()
+    for score, i in scored:
+        key = other_sentences[i][:80]
+        if key in seen: 
+            continue
+        seen.add(key)
+        top.append((score, i))
+        if len(top) >= 10:  # Limit for general content
+            break
+
+    return [other_sentences[i] for (_, i) in top]
+
+def _ask_events(st: Dict[str, Any], q: str, k: int, team: Optional[str], quarter: Optional[str]):
+    """
+    Generate the /ask answer incrementally for an already built corpus:
+    {"type": "filters"} first, then one {"type": "group"} per document in rank order,
+    an optional {"type": "fallback"} when no OKR structure was found, then {"type": "citations"}.
+    """
     # Normalize team and quarter parameters to match stored names
-    team = _normalize_team_param(team)
-    quarter = _normalize_quarter_param(quarter)
+    team = _normalize_team_param(st, team)
+    quarter = _normalize_quarter_param(st, quarter)
     
     # infer filters if not provided
     if not team and not quarter:
-        guess = _infer_filters_from_query(q)
+        guess = _infer_filters_from_query(st, q)
         team, quarter = team or guess["team"], quarter or guess["quarter"]
 
-    store, mode = _pick_store(team, quarter)
+    yield {"type": "filters", "query": q, "team": team, "quarter": quarter, "corpus": st["name"]}
+
+    store, mode = _pick_store(st, team, quarter)
     hits = store.similarity_search(q, k=max(k*2, k))
 
     # enforce both filters if both provided
@@ -244,11 +661,25 @@ def ask(
     if not enforced:
         enforced = hits[:k]
 
-    # Enhanced sentence extraction with OKR structure awareness
-    # Track document-level OKR groups to maintain objective-KR associations
-    document_okrs = []  # List of {objective, key_results, risks} per document
+    # Determine what to include based on query
+    query_lower = q.lower()
+    include = {
+        "objectives": "objective" in query_lower,
+        "krs": any(term in query_lower for term in ["key result", "kr", "krs", "key results"]),
+        "risks": "risk" in query_lower,
+    }
+    
+    # If no specific type is mentioned, include objectives and key results by default
+    if not any(include.values()):
+        include["objectives"] = True
+        include["krs"] = True
+
+    # Enhanced sentence extraction with OKR structure awareness; each document's
+    # objective/KR/risk group is emitted as soon as it is extracted
     other_sentences = []
     processed_docs = set()  # Track which documents we've already processed
+    seen_bullets = set()  # Track duplicates
+    any_bullets = False
     
     for h in enforced:
         # Skip if we've already processed this document
@@ -257,155 +688,85 @@ def ask(
             continue
         processed_docs.add(doc_path)
         
-        # Extract content from HTML more carefully
-        text_content = h.page_content.strip()
-        
-        # Initialize document-level OKR structure
-        doc_okr = {"objective": None, "key_results": [], "risks": []}
-        
-        # Extract objectives from H1 tags (either "Objective:" or just "Objective")
-        objective_matches = re.findall(r'<h1[^>]*>([^<]*(?:objective[^<]*|Objective[^<]*))</h1>', text_content, re.IGNORECASE)
-        for obj in objective_matches:
-            clean_obj = html.unescape(obj).strip()
-            # Handle both "Objective: Title" and just "Objective" formats
-            if clean_obj.lower() == 'objective':
-                # Look for the objective content in the next text
-                obj_content_match = re.search(r'<h1[^>]*>Objective</h1>\s*<p[^>]*>([^<]+)</p>', text_content, re.IGNORECASE)
-                if obj_content_match:
-                    clean_obj = f"Objective: {html.unescape(obj_content_match.group(1)).strip()}"
-                else:
-                    clean_obj = "Objective: [Content not found]"
-            elif not clean_obj.lower().startswith('objective:'):
-                clean_obj = f"Objective: {clean_obj}"
-            doc_okr["objective"] = clean_obj
-            break  # Only take first objective per document
-        
-        # Extract key results from different patterns
-        # First, try to extract from "Key Results" section
-        kr_section = re.search(r'<h2[^>]*>Key Results</h2>\s*<ul[^>]*>(.*?)</ul>', text_content, re.IGNORECASE | re.DOTALL)
-        if kr_section:
-            kr_items = re.findall(r'<li[^>]*>([^<]+)</li>', kr_section.group(1))
-            for i, kr in enumerate(kr_items, 1):
-                clean_kr = html.unescape(kr).strip()
-                # Add KR prefix if not already present
-                if not re.match(r'^KR\d+:', clean_kr, re.IGNORECASE):
-                    clean_kr = f"KR{i}: {clean_kr}"
-                doc_okr["key_results"].append(clean_kr)
-        else:
-            # Fallback: Look for traditional KR1:, KR2: format in any list items
-            kr_matches = re.findall(r'<li[^>]*>(KR\d+:[^<]*)</li>', text_content, re.IGNORECASE)
-            for kr in kr_matches:
-                clean_kr = html.unescape(kr).strip()
-                doc_okr["key_results"].append(clean_kr)
-        
-        # Extract risks from list items under risks section
-        risks_section = re.search(r'<h2[^>]*>Risks?</h2>\s*<ul[^>]*>(.*?)</ul>', text_content, re.IGNORECASE | re.DOTALL)
-        if risks_section:
-            risk_items = re.findall(r'<li[^>]*>([^<]+)</li>', risks_section.group(1))
-            for risk in risk_items:
-                clean_risk = html.unescape(risk).strip()
-                if len(clean_risk) > 10:
-                    doc_okr["risks"].append(clean_risk)
-        
-        # Only add document OKR if it has content
-        if doc_okr["objective"] or doc_okr["key_results"] or doc_okr["risks"]:
-            document_okrs.append(doc_okr)
-        
-        # Extract other meaningful content by removing HTML and getting sentences
-        clean_text = re.sub(r'<[^>]+>', ' ', text_content)
-        clean_text = html.unescape(clean_text)
-        clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-        
-        sentences_in_text = re.split(r'(?<=[.!?])\s+', clean_text)
-        for sentence in sentences_in_text:
-            sentence = sentence.strip()
-            if (20 <= len(sentence) <= 300 and 
-                not re.search(r'(objective|KR\d*|key results|risks):', sentence, re.IGNORECASE)):
-                other_sentences.append(sentence)
-    
-    # Determine what to include based on query
-    query_lower = q.lower()
-    include_objectives = "objective" in query_lower
-    include_krs = any(term in query_lower for term in ["key result", "kr", "krs", "key results"])
-    include_risks = "risk" in query_lower
-    
-    # If no specific type is mentioned, include objectives and key results by default
-    if not (include_objectives or include_krs or include_risks):
-        include_objectives = True
-        include_krs = True
-    
-    # Build structured response maintaining document-level grouping
-    bullets = []
-    seen_bullets = set()  # Track duplicates
-    
-    # Helper function to extract KR numbers for sorting within each document
-    def extract_kr_number(kr_text):
-        match = re.search(r'KR(\d+):', kr_text)
-        return int(match.group(1)) if match else 999  # Put unnumbered KRs at the end
-    
-    # Process each document's OKRs to maintain objective-KR association
-    for doc_okr in document_okrs:
-        # Add the objective for this document (if requested and exists)
-        if include_objectives and doc_okr["objective"]:
-            obj = doc_okr["objective"]
-            if obj not in seen_bullets:
-                bullets.append(obj)
-                seen_bullets.add(obj)
-        
-        # Add the key results for this document immediately after its objective (if requested)
-        if include_krs and doc_okr["key_results"]:
-            # Sort this document's KRs by their number (KR1, KR2, etc.)
-            sorted_krs = sorted(doc_okr["key_results"], key=extract_kr_number)
-            for kr in sorted_krs:
-                if kr not in seen_bullets:
-                    bullets.append(kr)
-                    seen_bullets.add(kr)
-        
-        # Add the risks for this document (if requested)
-        if include_risks and doc_okr["risks"]:
-            for risk in doc_okr["risks"]:
-                if risk not in seen_bullets:
-                    bullets.append(risk)
-                    seen_bullets.add(risk)
+        doc_okr, sentences = _extract_doc_okr(h.page_content.strip())
+        other_sentences.extend(sentences)
+
+        bullets = _doc_bullets(doc_okr, include, seen_bullets)
+        if bullets:
+            any_bullets = True
+            yield {"type": "group", "path": doc_path, "bullets": bullets}
     
     # If we don't have specific OKR content, fall back to semantic search
-    if not bullets and other_sentences:
-        # Use the original semantic scoring approach for general content
-        emb = state["embeddings"]
-        q_vec = emb.embed_query(q)
-        s_vecs = emb.embed_documents(other_sentences)
-
-        def cos(a, b):
-            import math
-            dot = sum(x*y for x, y in zip(a, b))
-            na = math.sqrt(sum(x*x for x in a))
-            nb = math.sqrt(sum(y*y for y in b))
-            return dot / (na * nb + 1e-12)
-
-        scored = [(cos(q_vec, v), i) for i, v in enumerate(s_vecs)]
-        scored.sort(reverse=True)
-
-        top, seen = [], set()
-        for score, i in scored:
-            key = other_sentences[i][:80]
-            if key in seen: 
-                continue
-            seen.add(key)
-            top.append((score, i))
-            if len(top) >= 10:  # Limit for general content
-                break
-
-        bullets = [other_sentences[i] for (_, i) in top]
+    if not any_bullets and other_sentences:
+        yield {"type": "fallback", "bullets": _fallback_bullets(q, other_sentences)}
 
-    citations: List[Hit] = []
+    citations: List[Dict[str, str]] = []
     for h in enforced[:min(10, len(enforced))]:  # Increased for comprehensive results
         snippet = h.page_content.strip()
         if len(snippet) > 300:
             snippet = snippet[:300] + "…"
-        citations.append(Hit(path=h.metadata.get("path", ""), snippet=snippet))
+        citations.append({"path": h.metadata.get("path", ""), "snippet": snippet})
+
+    yield {"type": "citations", "citations": citations}
+
+@app.get("/ask", response_model=AskResponse)
+def ask(
+    q: str = Query(..., min_length=2),
+    k: int = 50,  # Increased for comprehensive results in small system
+    team: Optional[str] = Query(None),        # NEW
+    quarter: Optional[str] = Query(None),     # NEW
+    corpus: Optional[str] = Query(None),
+):
+    """
+    Extractive answer with team/quarter filtering.
+    """
+    st = _ensure_built(corpus)
+
+    bullets: List[str] = []
+    citations: List[Hit] = []
+    for event in _ask_events(st, q, k, team, quarter):
+        if event["type"] == "filters":
+            team, quarter = event["team"], event["quarter"]
+        elif event["type"] in ("group", "fallback"):
+            bullets.extend(event["bullets"])
+        elif event["type"] == "citations":
+            citations = [Hit(**c) for c in event["citations"]]
 
     return AskResponse(query=q, bullets=bullets, citations=citations, team=team, quarter=quarter)
 
+@app.get("/ask/stream")
+def ask_stream(
+    q: str = Query(..., min_length=2),
+    k: int = 50,
+    team: Optional[str] = Query(None),
+    quarter: Optional[str] = Query(None),
+    corpus: Optional[str] = Query(None),
+    format: str = "ndjson",
+):
+    """
+    Streaming variant of /ask. Emits the resolved filters, then each document's
+    bullets as soon as they are extracted, then citations.
+    format=ndjson (one JSON object per line) or format=sse (text/event-stream).
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="Unsupported format. Use 'ndjson' or 'sse'.")
+
+    # Resolve the corpus before the response starts, so an unknown corpus is still a 404
+    st = _ensure_built(corpus)
+
+    def encode():
+        for event in _ask_events(st, q, k, team, quarter):
+            line = json.dumps(event, ensure_ascii=False)
+            if format == "sse":
+                yield f"event: {event['type']}\ndata: {line}\n\n"
+            else:
+                yield line + "\n"
+        if format == "sse":
+            yield "event: done\ndata: {}\n\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(encode(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
 @app.get("/download")
 def download(
     q: str = Query(..., min_length=2),
@@ -413,21 +774,22 @@ def download(
     format: str = "zip",
     team: Optional[str] = Query(None),        # NEW
     quarter: Optional[str] = Query(None),     # NEW
+    corpus: Optional[str] = Query(None),
 ):
     """
     Download matching OKR files (team/quarter aware).
     """
-    _ensure_built()
+    st = _ensure_built(corpus)
     
     # Normalize team and quarter parameters to match stored names
-    team = _normalize_team_param(team)
-    quarter = _normalize_quarter_param(quarter)
+    team = _normalize_team_param(st, team)
+    quarter = _normalize_quarter_param(st, quarter)
     
     if not team and not quarter:
-        guess = _infer_filters_from_query(q)
+        guess = _infer_filters_from_query(st, q)
         team, quarter = team or guess["team"], quarter or guess["quarter"]
 
-    store, mode = _pick_store(team, quarter)
+    store, mode = _pick_store(st, team, quarter)
     hits = store.similarity_search(q, k=max(k*2, k))
 
     # enforce both filters if needed
@@ -467,7 +829,7 @@ def download(
                 if rel_path in added:
                     continue
                 added.add(rel_path)
-                abs_path = os.path.join(OKR_DIR, rel_path)
+                abs_path = os.path.join(st["okr_dir"], rel_path)
                 if os.path.exists(abs_path):
                     zf.write(abs_path, arcname=rel_path)
         return FileResponse(zip_path, filename="okrs.zip")
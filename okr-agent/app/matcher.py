@@ -0,0 +1,107 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_QUARTER_RE = [
+    re.compile(r"^(?P<year>\d{4})\s*[-/ ]?\s*q(?P<q>[1-4])$"),
+    re.compile(r"^q(?P<q>[1-4])\s*[-/ ]?\s*(?P<year>\d{4})$"),
+]
+
+def _fold(s: str) -> str:
+    """Case-fold and collapse whitespace so lookups ignore spacing differences."""
+    return " ".join(str(s).split()).casefold()
+
+def quarter_aliases(quarter: str) -> List[str]:
+    """
+    Return the case-folded spellings a quarter may appear as in a query.
+    "2025-Q3" -> ["2025-q3", "2025 q3", "2025q3", "2025/q3", "q3 2025", "q3-2025", "q32025", "q3/2025"].
+    Quarters that don't look like YEAR-Qn only match themselves.
+    """
+    folded = _fold(quarter)
+    for rx in _QUARTER_RE:
+        m = rx.match(folded)
+        if m:
+            year, q = m.group("year"), f"q{m.group('q')}"
+            aliases = [folded]
+            for sep in ("-", " ", "", "/"):
+                for a in (f"{year}{sep}{q}", f"{q}{sep}{year}"):
+                    if a not in aliases:
+                        aliases.append(a)
+            return aliases
+    return [folded]
+
+def build_lookup(values: Iterable[str], aliases=None) -> Dict[str, str]:
+    """Map every case-folded spelling (plus optional aliases) back to its canonical value."""
+    lookup: Dict[str, str] = {}
+    for v in sorted(values):
+        if not v:
+            continue
+        for key in (aliases(v) if aliases else [_fold(v)]):
+            lookup.setdefault(key, v)
+    return lookup
+
+def normalize(value: Optional[str], lookup: Dict[str, str]) -> Optional[str]:
+    """Resolve a user-supplied value against a lookup built by build_lookup."""
+    if not value:
+        return None
+    return lookup.get(_fold(value), value)  # return original if no match found
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over case-folded keywords.
+    Built once per index build; `find` scans the query a single time regardless of how
+    many keywords are loaded and returns the longest match that sits on word boundaries
+    (so "platform-data" beats "platform", and "q3" inside "faq3" is ignored).
+    """
+
+    def __init__(self, lookup: Dict[str, str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]  # (keyword length, canonical value)
+
+        for key, value in lookup.items():
+            if not key:
+                continue
+            node = 0
+            for ch in key:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((len(key), value))
+
+        # Breadth-first pass to wire failure links and merge outputs along them
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> Optional[str]:
+        """Return the canonical value of the longest word-bounded keyword in text, if any."""
+        text = _fold(text)
+        best: Optional[Tuple[int, int, str]] = None  # (length, -start, value)
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length, value in self._out[node]:
+                start, end = i - length + 1, i + 1
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if end < len(text) and text[end].isalnum():
+                    continue
+                cand = (length, -start, value)
+                if best is None or cand[:2] > best[:2]:
+                    best = cand
+        return best[2] if best else None
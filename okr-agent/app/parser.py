@@ -1,4 +1,4 @@
-import glob, os
+import glob, os, re
 import frontmatter
 from markdown_it import MarkdownIt
 
@@ -24,3 +24,49 @@ def load_markdown_docs(okr_dir: str):
             "plain_text": post.content  # Keep the original markdown content for sentence extraction
         })
     return docs
+
+def extract_section_items(markdown: str, heading: str):
+    """
+    Return the bullet items listed under a Markdown heading (e.g. "Key Results", "Risks"),
+    stopping at the next heading. Matching is case-insensitive and tolerates a trailing "s".
+    """
+    items, in_section = [], False
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        m = re.match(r'^#{1,6}\s+(.*?)\s*$', stripped)
+        if m:
+            title = m.group(1).rstrip(":").lower()
+            in_section = title in (heading.lower(), heading.lower().rstrip("s"), heading.lower() + "s")
+            continue
+        if in_section:
+            b = re.match(r'^[-*+]\s+(.*)$', stripped)
+            if b and b.group(1).strip():
+                items.append(b.group(1).strip())
+    return items
+
+_KR_LABEL = re.compile(r'^KR(\d+):', re.IGNORECASE)
+
+def label_key_results(items):
+    """Prefix each key result with "KR{n}: " by position, unless it already carries a KR label."""
+    return [kr if _KR_LABEL.match(kr) else f"KR{i}: {kr}" for i, kr in enumerate(items, 1)]
+
+def kr_number(kr_text: str) -> int:
+    """Sort key for labelled key results: the n of "KRn:", unnumbered ones last."""
+    m = _KR_LABEL.match(kr_text)
+    return int(m.group(1)) if m else 999
+
+def extract_objective(markdown: str):
+    """Return the objective title from "# Objective: X" or "# Objective" followed by a paragraph."""
+    lines = [l.strip() for l in markdown.splitlines()]
+    for i, line in enumerate(lines):
+        m = re.match(r'^#\s+objective\s*:?\s*(.*)$', line, re.IGNORECASE)
+        if not m:
+            continue
+        if m.group(1):
+            return m.group(1).strip()
+        for nxt in lines[i + 1:]:
+            if nxt.startswith("#"):
+                break
+            if nxt:
+                return nxt
+    return None
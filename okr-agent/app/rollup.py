@@ -0,0 +1,66 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from app.parser import extract_objective, extract_section_items
+
+OBJECTIVE_COLUMNS = ["path", "team", "quarter", "owner", "status", "objective", "kr_count"]
+KR_COLUMNS = ["path", "team", "quarter", "owner", "status", "kr", "text"]
+GROUPABLE = {"team", "quarter", "owner", "status", "path"}
+
+class ColumnTable:
+    """
+    Minimal in-memory column store: one Python list per column, rows aligned by index.
+    Filters produce a row-index selection; group-bys zip only the requested columns.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns: Dict[str, List[Any]] = {c: [] for c in columns}
+
+    def __len__(self) -> int:
+        first = next(iter(self.columns.values()), [])
+        return len(first)
+
+    def append(self, row: Dict[str, Any]):
+        for name, col in self.columns.items():
+            col.append(row.get(name))
+
+    def select(self, filters: Dict[str, Optional[str]]) -> List[int]:
+        """Row indexes matching every non-empty filter (exact match on the stored value)."""
+        rows = range(len(self))
+        for name, value in filters.items():
+            if not value:
+                continue
+            col = self.columns[name]
+            rows = [i for i in rows if col[i] == value]
+        return list(rows)
+
+    def group_count(self, group_by: List[str], rows: List[int]) -> List[Dict[str, Any]]:
+        """Count selected rows per distinct combination of the group_by columns."""
+        cols = [self.columns[g] for g in group_by]
+        counts = Counter(tuple(c[i] for c in cols) for i in rows)
+        out = []
+        for key, n in sorted(counts.items(), key=lambda kv: tuple(str(v) for v in kv[0])):
+            entry = dict(zip(group_by, key))
+            entry["count"] = n
+            out.append(entry)
+        return out
+
+def build_tables(docs: List[Dict[str, Any]], normalize_meta) -> Dict[str, ColumnTable]:
+    """Build the objectives and key_results tables from parsed docs (frontmatter + Markdown body)."""
+    objectives = ColumnTable(OBJECTIVE_COLUMNS)
+    key_results = ColumnTable(KR_COLUMNS)
+    for d in docs:
+        meta = d["meta"]
+        base = {
+            "path": d["path"],
+            "team": normalize_meta(meta.get("team")),
+            "quarter": normalize_meta(meta.get("quarter")),
+            "owner": normalize_meta(meta.get("owner")),
+            "status": normalize_meta(meta.get("status")),
+        }
+        body = d.get("plain_text", "")
+        krs = extract_section_items(body, "Key Results")
+        objectives.append({**base, "objective": extract_objective(body), "kr_count": len(krs)})
+        for i, kr in enumerate(krs, 1):
+            key_results.append({**base, "kr": f"KR{i}", "text": kr})
+    return {"objectives": objectives, "key_results": key_results}
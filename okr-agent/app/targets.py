@@ -0,0 +1,240 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional
+
+from app.rollup import ColumnTable
+
+# Canonical units and the spellings that map to them
+UNIT_ALIASES = {
+    "ms": "ms", "millisecond": "ms", "milliseconds": "ms",
+    "s": "s", "sec": "s", "secs": "s", "second": "s", "seconds": "s",
+    "min": "minutes", "mins": "minutes", "minute": "minutes", "minutes": "minutes",
+    "h": "hours", "hr": "hours", "hrs": "hours", "hour": "hours", "hours": "hours",
+    "day": "days", "days": "days",
+    "week": "weeks", "weeks": "weeks",
+    "%": "%", "pct": "%", "percent": "%",
+    "$": "$", "usd": "$",
+    "": "",
+}
+
+# Time units expressed in milliseconds, so a "1.2s → 800ms" baseline is comparable to its target
+_TIME_SCALE = {"ms": 1, "s": 1_000, "minutes": 60_000, "hours": 3_600_000, "days": 86_400_000, "weeks": 604_800_000}
+
+# Commas only as thousands separators ("1,200"); k/m multipliers only on currency ("$50k", "$1.2m")
+_NUM = (
+    r'(?P<{p}cur>\$)?(?P<{p}num>\d{{1,3}}(?:,\d{{3}})+(?:\.\d+)?|\d+(?:\.\d+)?)'
+    r'(?({p}cur)\s*(?P<{p}mult>[km](?![a-z]))?)'
+    r'\s*(?P<{p}unit>ms|%|minutes?|mins?(?![a-z])|days?|weeks?|hours?|hrs?|seconds?|secs?|s(?![a-z]))?'
+)
+_ARROW = r'\s*(?:→|->|=>|to)\s*'
+_CMP_WORDS = {
+    "≥": ">=", ">=": ">=", "at least": ">=", "over": ">", "above": ">", "more than": ">", ">": ">",
+    "≤": "<=", "<=": "<=", "at most": "<=", "under": "<", "below": "<", "less than": "<", "<": "<",
+}
+_CMP = r'(?P<cmp>≥|>=|≤|<=|\b(?:at least|at most|more than|less than|over|above|under|below)\b|<|>)'
+_DECREASE_VERBS = re.compile(r'\b(reduce|decrease|cut|lower|shrink|drop)\b', re.IGNORECASE)
+_INCREASE_VERBS = re.compile(r'\b(increase|grow|raise|improve|boost|expand)\b', re.IGNORECASE)
+_BY = re.compile(r'\bby\s*$', re.IGNORECASE)
+
+# Dates are not targets: ISO dates ("2025-09-30", "2025-09"), quarters ("Q3 2025", "2025-Q3")
+# and bare years after a time preposition ("by 2026")
+_DATES = re.compile(
+    r'\b\d{4}-\d{1,2}(?:-\d{1,2})?\b'
+    r'|\bq[1-4]\s*[-/ ]?\s*\d{4}\b|\b\d{4}\s*[-/ ]?\s*q[1-4]\b'
+    r'|\b(?:by|in|until|before|after|during)\s+(?:19|20)\d{2}\b(?!-\d)',
+    re.IGNORECASE,
+)
+
+_FROM_TO = re.compile(r'from\s+' + _NUM.format(p="a") + _ARROW + _CMP.replace("cmp", "tcmp") + r'?\s*' + _NUM.format(p="b"), re.IGNORECASE)
+_TO_FROM = re.compile(r'to\s+' + _CMP + r'?\s*' + _NUM.format(p="b") + r'[^()]*\(\s*from\s+' + _NUM.format(p="a"), re.IGNORECASE)
+_COMPARED = re.compile(_CMP + r'\s*' + _NUM.format(p="b"), re.IGNORECASE)
+_PLAIN = re.compile(r'(?<![\w.])[+]?' + _NUM.format(p="b"), re.IGNORECASE)
+
+def _value(m: re.Match, p: str) -> float:
+    v = float(m.group(f"{p}num").replace(",", ""))
+    mult = (m.group(f"{p}mult") or "").lower()
+    return v * {"k": 1_000, "m": 1_000_000}.get(mult, 1)
+
+def _unit(m: re.Match, p: str) -> str:
+    if m.group(f"{p}cur"):
+        return "$"
+    return UNIT_ALIASES.get((m.group(f"{p}unit") or "").lower(), "")
+
+def _pair(m: re.Match):
+    """Baseline, target and unit from a match with "a" (baseline) and "b" (target) groups."""
+    baseline, target = _value(m, "a"), _value(m, "b")
+    ua, ub = _unit(m, "a"), _unit(m, "b")
+    if ua != ub and ua in _TIME_SCALE and ub in _TIME_SCALE:
+        baseline = baseline * _TIME_SCALE[ua] / _TIME_SCALE[ub]
+    return baseline, target, ub or ua
+
+def normalize_unit(unit: Optional[str]) -> Optional[str]:
+    if unit is None:
+        return None
+    u = unit.strip().lower()
+    return UNIT_ALIASES.get(u, u)
+
+def _mask_dates(text: str) -> str:
+    """Blank out the digits of dates (keeping offsets) so no number pattern can pick them up."""
+    return _DATES.sub(lambda m: re.sub(r'\d', " ", m.group()), text)
+
+def parse_target(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract baseline/target/unit/comparator from a KR line. The comparator comes from an
+    explicit word or symbol, or from the direction of baseline -> target; with neither it
+    is None (unknown). "By N" is a change, not a target, so it is returned as a delta.
+    Returns None when the line carries no number (dates don't count).
+
+    >>> parse_target("Reduce p95 latency from 420ms → 250ms.")
+    {'baseline': 420.0, 'target': 250.0, 'unit': 'ms', 'comparator': '<=', 'delta': -170.0}
+    >>> parse_target("≥ 95% SLO compliance")
+    {'baseline': None, 'target': 95.0, 'unit': '%', 'comparator': '>=', 'delta': None}
+    >>> parse_target("Keep p99 latency under 1s")
+    {'baseline': None, 'target': 1.0, 'unit': 's', 'comparator': '<', 'delta': None}
+    >>> parse_target("Bring p95 latency to 0.25s")
+    {'baseline': None, 'target': 0.25, 'unit': 's', 'comparator': None, 'delta': None}
+    >>> parse_target("10 new enterprise logos (≥ $50k ARR each).")
+    {'baseline': None, 'target': 10.0, 'unit': '', 'comparator': None, 'delta': None}
+    >>> parse_target("Reduce p95 latency by 100ms")
+    {'baseline': None, 'target': None, 'unit': 'ms', 'comparator': None, 'delta': -100.0}
+    >>> parse_target("Cut cloud spend by 15%")
+    {'baseline': None, 'target': None, 'unit': '%', 'comparator': None, 'delta': -15.0}
+    >>> parse_target("Reduce MTTR from 4 hours to 30 minutes")
+    {'baseline': 240.0, 'target': 30.0, 'unit': 'minutes', 'comparator': '<=', 'delta': -210.0}
+    >>> parse_target("Ship v2 API by 2025-09-30") is None
+    True
+    """
+    text = _mask_dates(text)
+    baseline = None
+    cmp = None
+    m = _FROM_TO.search(text)
+    if m:
+        baseline, target, unit = _pair(m)
+        cmp = _CMP_WORDS.get((m.group("tcmp") or "").lower())
+    else:
+        m = _TO_FROM.search(text)
+        if m:
+            baseline, target, unit = _pair(m)
+            cmp = _CMP_WORDS.get((m.group("cmp") or "").lower())
+        else:
+            # A comparator only wins if no number precedes it; comparators inside
+            # parenthetical qualifiers ("10 logos (≥ $50k ARR each)") are ignored
+            unqualified = re.sub(r'\([^()]*\)', lambda p: " " * len(p.group()), text)
+            cm, pm = _COMPARED.search(unqualified), _PLAIN.search(text)
+            m = cm if cm and (pm is None or cm.start() <= pm.start()) else pm
+            if not m:
+                return None
+            if m is pm and _BY.search(text[:m.start()]):
+                # "by N" is the size of the change; its sign comes from the verb
+                amount, unit = _value(m, "b"), _unit(m, "b")
+                if _DECREASE_VERBS.search(text):
+                    delta = -amount
+                elif _INCREASE_VERBS.search(text):
+                    delta = amount
+                else:
+                    return None
+                return {"baseline": None, "target": None, "unit": unit, "comparator": None, "delta": delta}
+            target, unit = _value(m, "b"), _unit(m, "b")
+            if "cmp" in m.groupdict() and m.group("cmp"):
+                cmp = _CMP_WORDS[m.group("cmp").lower()]
+
+    if cmp is None and baseline is not None:
+        cmp = "<=" if target < baseline else ">="
+    return {
+        "baseline": baseline,
+        "target": target,
+        "unit": unit,
+        "comparator": cmp,
+        "delta": None if baseline is None else target - baseline,
+    }
+
+def _index_key(unit: str) -> str:
+    """Every time unit shares one index, in milliseconds; other units index as written."""
+    return "ms" if unit in _TIME_SCALE else unit
+
+def _to_base(value: Optional[float], unit: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    return value * _TIME_SCALE.get(unit, 1)
+
+class TargetIndex:
+    """
+    Numeric KR targets grouped by unit. Each unit keeps its targets in a sorted array
+    (with parallel row ids) so range filters are a pair of bisects rather than a scan.
+    Time targets (ms, s, minutes, ...) share one array in milliseconds, so
+    unit=ms&max_target=300 also finds "0.25s"; rows keep the unit as written for display.
+    """
+
+    def __init__(self, key_results: ColumnTable):
+        self.rows: List[Dict[str, Any]] = []
+        cols = key_results.columns
+        for i in range(len(key_results)):
+            parsed = parse_target(cols["text"][i])
+            if parsed is None:
+                continue
+            row = {name: cols[name][i] for name in ("path", "team", "quarter", "owner", "status", "kr", "text")}
+            row.update(parsed)
+            row["_key"] = _index_key(parsed["unit"])
+            row["_target"] = _to_base(parsed["target"], parsed["unit"])
+            row["_delta"] = _to_base(parsed["delta"], parsed["unit"])
+            self.rows.append(row)
+
+        self.by_unit: Dict[str, Dict[str, list]] = {}
+        for key in sorted({r["_key"] for r in self.rows}):
+            rows = [i for i, r in enumerate(self.rows) if r["_key"] == key]
+            ids = sorted((i for i in rows if self.rows[i]["_target"] is not None), key=lambda i: self.rows[i]["_target"])
+            self.by_unit[key] = {
+                "targets": [self.rows[i]["_target"] for i in ids],
+                "ids": ids,
+                "untargeted": [i for i in rows if self.rows[i]["_target"] is None],  # "by N" changes
+            }
+
+    def units(self) -> List[str]:
+        return list(self.by_unit)
+
+    def query(
+        self,
+        unit: Optional[str] = None,
+        min_target: Optional[float] = None,
+        max_target: Optional[float] = None,
+        min_delta: Optional[float] = None,
+        max_delta: Optional[float] = None,
+        team: Optional[str] = None,
+        quarter: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Rows whose target lies in [min_target, max_target] and whose delta (target - baseline,
+        or the signed "by N" change) lies in [min_delta, max_delta]. "By N" rows have no target,
+        so any target bound leaves them out. Bounds are in the requested unit; for time units they
+        are scaled to milliseconds, so any time unit searches the same array.
+        """
+        scale = _TIME_SCALE.get(unit, 1) if unit is not None else 1
+        min_target, max_target, min_delta, max_delta = (
+            None if v is None else v * scale for v in (min_target, max_target, min_delta, max_delta)
+        )
+        units = [_index_key(unit)] if unit is not None else list(self.by_unit)
+        out = []
+        for u in units:
+            idx = self.by_unit.get(u)
+            if not idx:
+                continue
+            lo = bisect_left(idx["targets"], min_target) if min_target is not None else 0
+            hi = bisect_right(idx["targets"], max_target) if max_target is not None else len(idx["targets"])
+            ids = idx["ids"][lo:hi]
+            if min_target is None and max_target is None:
+                ids = ids + idx["untargeted"]
+            for i in ids:
+                r = self.rows[i]
+                if team and r["team"] != team:
+                    continue
+                if quarter and r["quarter"] != quarter:
+                    continue
+                if min_delta is not None or max_delta is not None:
+                    if r["_delta"] is None:
+                        continue
+                    if min_delta is not None and r["_delta"] < min_delta:
+                        continue
+                    if max_delta is not None and r["_delta"] > max_delta:
+                        continue
+                out.append(r)
+        return out
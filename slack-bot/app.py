@@ -38,6 +38,32 @@ def query_okr_agent(query, team=None, quarter=None):
     except requests.RequestException as e:
         return {"error": f"Failed to query OKR agent: {str(e)}"}
 
+def get_okr_digest(query, team=None, quarter=None):
+    """
+    Fetch a precomputed digest from the OKR agent. The agent decides whether the query
+    is section-only ("objectives and key results", "risks"); None means use /ask instead
+    (needs a search, unknown team, or agent unavailable)
+    """
+    params = {"q": query}
+    if team:
+        params["team"] = team
+    if quarter:
+        params["quarter"] = quarter
+    
+    try:
+        response = requests.get(f"{OKR_API_BASE}/digest", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException:
+        return None
+
+def answer_okr_query(query, team=None, quarter=None):
+    """Answer from the digest when possible, falling back to /ask"""
+    data = get_okr_digest(query, team, quarter)
+    if data is not None:
+        return data
+    return query_okr_agent(query, team, quarter)
+
 def format_okr_response(data):
     """Format OKR response for Slack"""
     if "error" in data:
@@ -109,7 +135,7 @@ def okr_command(ack, respond, command):
         return
     
     # Query the OKR agent
-    data = query_okr_agent(query, team, quarter)
+    data = answer_okr_query(query, team, quarter)
     response = format_okr_response(data)
     
     respond(response)
@@ -120,20 +146,18 @@ def okr_teams_command(ack, respond):
     ack()
     
     try:
-        # Get all teams by querying without filters
-        response = requests.get(f"{OKR_API_BASE}/ask", params={"q": "teams"}, timeout=10)
+        # The unfiltered digest lists every team alongside each team's objectives
+        response = requests.get(f"{OKR_API_BASE}/digest", params={"include": "objectives"}, timeout=10)
+        response.raise_for_status()
         data = response.json()
         
-        # Extract unique teams from citations
-        teams = set()
-        for citation in data.get("citations", []):
-            path = citation.get("path", "")
-            if "teams/" in path:
-                team_name = path.split("teams/")[1].split("/")[0]
-                teams.add(team_name.title())
+        counts = {}
+        for entry in data.get("objectives", []):
+            counts[entry.get("team", "")] = counts.get(entry.get("team", ""), 0) + 1
         
+        teams = data.get("teams", [])
         if teams:
-            teams_list = ", ".join(sorted(teams))
+            teams_list = "\n".join(f"• {t} ({counts.get(t, 0)} objectives)" for t in teams)
             respond(f"📊 *Available Teams:*\n{teams_list}")
         else:
             respond("No teams found.")
@@ -178,7 +202,7 @@ def handle_explore_team(ack, body, respond):
     ack()
     
     team = body["actions"][0]["value"]
-    data = query_okr_agent("objectives and key results", team=team)
+    data = answer_okr_query("objectives and key results", team=team)
     response = format_okr_response(data)
     
     respond(response)
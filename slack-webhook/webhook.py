@@ -36,10 +36,21 @@ def okr_webhook():
         params["quarter"] = quarter
     
     try:
-        # Query OKR Agent
-        response = requests.get(f"{OKR_API_BASE}/ask", params=params, timeout=30)
-        response.raise_for_status()
-        okr_data = response.json()
+        okr_data = None
+        # Precomputed digest for section-only queries; the agent answers 422 when the
+        # query needs a search and 404 for an unknown team/quarter, both fall through to /ask
+        try:
+            response = requests.get(f"{OKR_API_BASE}/digest", params=params, timeout=10)
+            if response.ok:
+                okr_data = response.json()
+        except requests.RequestException:
+            okr_data = None  # digest unavailable; /ask below reports any real outage
+        
+        if okr_data is None:
+            # Query OKR Agent
+            response = requests.get(f"{OKR_API_BASE}/ask", params=params, timeout=30)
+            response.raise_for_status()
+            okr_data = response.json()
         
         # Format response for Slack
         formatted_response = format_slack_response(okr_data)